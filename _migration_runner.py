@@ -0,0 +1,135 @@
+"""
+Shared plumbing for the one-off migration scripts (migrate_add_*.py).
+Opens the database with the standard library sqlite3 module (no Flask or
+SQLAlchemy import cost), applies SQLite pragmas, runs a script's steps in a
+single transaction and prints the usual banners and prompt.
+"""
+
+import sqlite3
+import sys
+
+DB_PATH = "instance/athlete_data.db"
+
+# Same WAL / relaxed-fsync setup as app.py, plus a 64 MiB page cache
+PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL", "temp_store=MEMORY",
+           "cache_size=-65536", "mmap_size=268435456")
+
+# Rows per executemany() call when backfilling one value per row. Each row
+# binds its own parameters, so SQLite's 999 bound-variable limit applies per
+# row rather than per batch; the chunking only bounds memory held per call.
+BATCH = 5000
+
+# Connection for the migration currently running
+_connection = None
+
+def connect():
+    """Open the existing database read-write. mode=rw raises OperationalError
+    for a missing file instead of silently creating an empty database."""
+    return sqlite3.connect(f"file:{DB_PATH}?mode=rw", uri=True, isolation_level=None)
+
+def execute(sql, params=()):
+    """Run one SQL statement inside the migration transaction"""
+    return _connection.execute(sql, params)
+
+def backfill(sql, rows):
+    """Run a parameterised statement for many rows in BATCH-sized executemany calls"""
+    for start in range(0, len(rows), BATCH):
+        _connection.executemany(sql, rows[start:start + BATCH])
+
+def snapshot_schema(tables):
+    """{table: {column, ...}} for those of `tables` that exist, in a single query"""
+    schema = {}
+    params = {f"t{i}": table for i, table in enumerate(tables)}
+    result = execute(
+        "SELECT m.name, p.name FROM sqlite_master AS m "
+        "JOIN pragma_table_info(m.name) AS p "
+        f"WHERE m.type = 'table' AND m.name IN ({', '.join(':' + key for key in params)})",
+        params
+    )
+    for table, column in result:
+        schema.setdefault(table, set()).add(column)
+    return schema
+
+def add_column(table, column_ddl):
+    """ALTER TABLE ... ADD COLUMN; returns False if the column already exists"""
+    try:
+        execute(f"ALTER TABLE {table} ADD COLUMN {column_ddl}")
+    except sqlite3.OperationalError as e:
+        if 'duplicate column' not in str(e):
+            raise
+        return False
+    return True
+
+def run_migration(title, tables, pending, steps, summary):
+    """Run steps(schema) in one transaction, where schema snapshots `tables`.
+    pending(schema) lists outstanding work; when it is empty nothing runs.
+    Returns True on success."""
+    global _connection
+    try:
+        print("="*60)
+        print(title)
+        print("="*60)
+        
+        # isolation_level=None: no implicit transactions, the BEGIN below is explicit
+        _connection = connect()
+        
+        # One executescript() round for the pragmas; they go before the
+        # transaction since journal_mode can't change inside one
+        _connection.executescript("".join(f"PRAGMA {pragma};\n" for pragma in PRAGMAS))
+        schema = snapshot_schema(tables)
+        if not pending(schema):
+            print("\n✓ Database already migrated; nothing to do.")
+            return True
+        
+        # Explicit BEGIN so every step (DDL included) commits or rolls back together
+        execute("BEGIN")
+        steps(schema)
+        execute("COMMIT")
+        
+        # Refresh planner statistics for the changed tables (cheap no-op
+        # when nothing needs analysing)
+        execute("PRAGMA optimize")
+        
+        # Summary
+        print("\n" + "="*60)
+        print("MIGRATION COMPLETED SUCCESSFULLY!")
+        print("="*60)
+        for line in summary:
+            print(line)
+        print("\n" + "="*60)
+    
+    except Exception as e:
+        print(f"\n✗ Migration failed: {e}")
+        if _connection is not None and _connection.in_transaction:
+            execute("ROLLBACK")
+        return False
+    finally:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+    
+    return True
+
+def prompt_and_run(migrate, missing_db_help):
+    """Interactive entry point shared by the migration scripts' __main__"""
+    print("\n⚠️  IMPORTANT: Backup your database before proceeding!")
+    print(f"Database location: {DB_PATH}")
+    
+    # Probe with the same read-write open the migration uses
+    try:
+        connect().close()
+    except sqlite3.OperationalError:
+        print(f"\n✗ Database not found at {DB_PATH}")
+        for line in missing_db_help:
+            print(line)
+        sys.exit(1)
+    
+    response = input("\nDo you want to proceed with the migration? (y/n): ").lower()
+    
+    if response == 'y':
+        print("\nStarting migration...\n")
+        success = migrate()
+        if not success:
+            print("\nMigration failed. Please check the error messages above.")
+    else:
+        print("\nMigration cancelled.")
@@ -1,14 +1,22 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, abort
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Float, Boolean, DateTime
+from sqlalchemy import Integer, String, Float, Boolean, DateTime, func, exists, event, inspect, case
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 import datetime as dt
-from collections import defaultdict
-import requests, os, secrets, smtplib
+from itertools import groupby
+from operator import attrgetter
+import requests, os, secrets, smtplib, sqlite3, threading, time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from authlib.integrations.flask_client import OAuth
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from itsdangerous import URLSafeTimedSerializer
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -18,23 +26,124 @@ load_dotenv()
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+# Routes redirect right after committing, so skip the post-commit expire/reload
+db = SQLAlchemy(model_class=Base, session_options={"expire_on_commit": False})
 app = Flask(__name__)
+# Railway terminates TLS at its proxy; trust one hop of X-Forwarded-Proto/Host
+# so url_for(_external=True) builds https:// URLs without per-request hooks
+app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///athlete_data.db"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True, "pool_size": 5}
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", secrets.token_hex(32))
 
+# Explicit KDF cost so registration CPU time doesn't drift with Werkzeug defaults.
+# Overridable (e.g. "pbkdf2:sha256:120000" for local dev); check_password_hash
+# reads the method from each stored hash, so existing users keep logging in.
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+
 # Strava API Configuration
 STRAVA_CLIENT_ID = os.environ.get("STRAVA_CLIENT_ID")
 STRAVA_CLIENT_SECRET = os.environ.get("STRAVA_CLIENT_SECRET")
 STRAVA_REDIRECT_URI = os.environ.get("STRAVA_REDIRECT_URI", "http://localhost:5001/strava/callback")
+STRAVA_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+# Number of activity rows rendered per page on the dashboard
+HOME_PAGE_SIZE = 50
+
+# Shared HTTP session so Strava calls reuse pooled keep-alive connections
+STRAVA_HTTP = requests.Session()
+STRAVA_HTTP.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # raise_on_status=False: once retries run out, hand back the last 429/5xx
+    # response so callers see a status code rather than a RetryError
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)
+))
+
+# Activity list paging: pages after the first are fetched concurrently, with
+# a process-wide cap on in-flight page requests to respect Strava rate limits
+STRAVA_PAGE_SIZE = 200
+STRAVA_MAX_PAGES = 10
+STRAVA_IMPORT_OVERLAP = 7 * 86400  # seconds re-scanned behind the import mark
+STRAVA_FETCH_WORKERS = 4
+_STRAVA_PAGE_SLOTS = threading.Semaphore(STRAVA_FETCH_WORKERS)
+
+# Strava activity types mapped to the dashboard's activity names
+STRAVA_ACTIVITY_TYPES = {
+    'Run': 'Running',
+    'Ride': 'Cycling',
+    'Swim': 'Swimming',
+    'Walk': 'Walking',
+    'WeightTraining': 'Gym'
+}
+
+# In-process cache of Strava access tokens keyed by user_id, so repeat
+# calls skip the StravaToken SELECT until the token is close to expiry.
+# Entries are re-checked against the DB after a short TTL because each
+# gunicorn worker has its own cache (e.g. a disconnect in another worker).
+STRAVA_TOKEN_REFRESH_MARGIN = 300  # refresh proactively with < 5 min left
+STRAVA_TOKEN_CACHE_TTL = 60
+_STRAVA_TOKEN_CACHE = {}
+_STRAVA_TOKEN_LOCK = threading.Lock()
 
 # Email Configuration
 SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
 EMAIL_ADDRESS = os.environ.get("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
+SMTP_TIMEOUT = 10
+
+class PooledSMTP:
+    """One SMTP session reused across sends, so each email skips STARTTLS
+    and AUTH; reconnects when the server has dropped an idle session"""
+    
+    def __init__(self, host, port, username, password):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.server = None
+        self.lock = threading.Lock()
+    
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        server.starttls()
+        server.login(self.username, self.password)
+        self.server = server
+    
+    def _close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+    
+    def _is_alive(self):
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPServerDisconnected, OSError):
+            return False
+    
+    def send_message(self, msg):
+        with self.lock:
+            if self.server is not None and not self._is_alive():
+                self._close()
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.send_message(msg)
+            except Exception:
+                # Don't reuse a session left in an unknown state
+                self._close()
+                raise
+
+SMTP_MAILER = PooledSMTP(SMTP_SERVER, SMTP_PORT, EMAIL_ADDRESS, EMAIL_PASSWORD)
+# A single background sender: registration returns without waiting on SMTP
+EMAIL_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email")
 
 # OAuth Configuration
 oauth = OAuth(app)
@@ -63,55 +172,159 @@ github = oauth.register(
 
 db.init_app(app)
 
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL journaling, relaxed fsync and memory-mapped reads for SQLite
+    (no-op on other databases)"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # map up to 256 MiB of the file
+    cursor.close()
+
 # Models
 class User(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
-    username: Mapped[str] = mapped_column(String(80), nullable=True)
+    email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False, index=True)
+    username: Mapped[str] = mapped_column(String(80), nullable=True, index=True)
     password_hash: Mapped[str] = mapped_column(String(200), nullable=True)
     oauth_provider: Mapped[str] = mapped_column(String(20), nullable=True)  # 'google', 'github', or None
     oauth_id: Mapped[str] = mapped_column(String(200), nullable=True)
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=lambda: dt.datetime.now(dt.timezone.utc))
     
 class Athlete_Data(db.Model):
+    # Serves the dashboard's per-user ORDER BY month_year, date, id and GROUP BY month_year
+    __table_args__ = (
+        db.Index('ix_athlete_user_month_date', 'user_id', 'month_year', 'date'),
+    )
+    
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, nullable=False)  # Link to User
-    date: Mapped[str] = mapped_column(String(250), nullable=True)
+    date: Mapped[str] = mapped_column(String(250), nullable=True)  # YYYY-MM-DD
     activity_type: Mapped[str] = mapped_column(String(100), nullable=True)
     distance: Mapped[float] = mapped_column(Float, nullable=True)
     time: Mapped[str] = mapped_column(String(50), nullable=True)
-    pace: Mapped[str] = mapped_column(String(50), nullable=True)
+    pace: Mapped[str] = mapped_column(String(50), nullable=True)  # legacy MM:SS, kept during transition
+    pace_seconds: Mapped[int] = mapped_column(Integer, nullable=True)  # seconds per km
     calories: Mapped[float] = mapped_column(Float, nullable=True)
-    month_year: Mapped[str] = mapped_column(String(50), nullable=True)
-    strava_id: Mapped[int] = mapped_column(Integer, nullable=True, unique=True)
+    month_year: Mapped[str] = mapped_column(String(50), nullable=True)  # YYYY-MM
+    strava_id: Mapped[int] = mapped_column(Integer, nullable=True, unique=True, index=True)
 
 class StravaToken(db.Model):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, nullable=False)  # Link to User
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, unique=True, index=True)  # Link to User
     access_token: Mapped[str] = mapped_column(String(500), nullable=False)
     refresh_token: Mapped[str] = mapped_column(String(500), nullable=False)
     expires_at: Mapped[int] = mapped_column(Integer, nullable=False)
     athlete_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Newest Strava start_date (epoch) imported so far; None before the first import
+    last_import_epoch: Mapped[int] = mapped_column(Integer, nullable=True)
+
+def init_db():
+    """Create any missing tables and indexes (safe to run repeatedly)"""
+    with app.app_context():
+        db.create_all()
+        migrate_strava_token_unique()
+        drop_obsolete_indexes()
+        # create_all skips existing tables, so add indexes declared since then
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        migrate_dates_to_iso()
+        migrate_pace_seconds()
+        migrate_strava_import_mark()
+
+# Superseded by ix_athlete_user_month_date, which every athlete query uses
+OBSOLETE_INDEXES = ('ix_athlete__data_date', 'ix_athlete__data_month_year', 'ix_athlete_month_year_date')
+
+def drop_obsolete_indexes():
+    """Drop indexes no query uses any more; they only slow down inserts"""
+    for name in OBSOLETE_INDEXES:
+        db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+    db.session.commit()
+
+def migrate_strava_token_unique():
+    """Keep one token row per user so strava_token.user_id can be indexed unique"""
+    index = next((ix for ix in inspect(db.engine).get_indexes('strava_token')
+                  if ix['name'] == 'ix_strava_token_user_id'), None)
+    if index and index['unique']:
+        return
+    db.session.execute(db.text(
+        "DELETE FROM strava_token WHERE id NOT IN "
+        "(SELECT MAX(id) FROM strava_token GROUP BY user_id)"
+    ))
+    if index:
+        # Earlier non-unique version; init_db recreates it as unique
+        db.session.execute(db.text("DROP INDEX ix_strava_token_user_id"))
+    db.session.commit()
+
+def migrate_dates_to_iso():
+    """Rewrite legacy DD-MM-YYYY / MM-YYYY rows to ISO YYYY-MM-DD / YYYY-MM"""
+    db.session.execute(db.text(
+        "UPDATE athlete__data "
+        "SET date = substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2) "
+        "WHERE date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'"
+    ))
+    db.session.execute(db.text(
+        "UPDATE athlete__data "
+        "SET month_year = substr(month_year, 4, 4) || '-' || substr(month_year, 1, 2) "
+        "WHERE month_year GLOB '[0-9][0-9]-[0-9][0-9][0-9][0-9]'"
+    ))
+    db.session.commit()
+
+def migrate_pace_seconds():
+    """Add athlete__data.pace_seconds and backfill it from the MM:SS pace column"""
+    columns = {c['name'] for c in inspect(db.engine).get_columns('athlete__data')}
+    if 'pace_seconds' not in columns:
+        db.session.execute(db.text("ALTER TABLE athlete__data ADD COLUMN pace_seconds INTEGER"))
+    db.session.execute(db.text(
+        "UPDATE athlete__data "
+        "SET pace_seconds = CAST(substr(pace, 1, instr(pace, ':') - 1) AS INTEGER) * 60 "
+        "+ CAST(substr(pace, instr(pace, ':') + 1) AS INTEGER) "
+        "WHERE pace_seconds IS NULL AND pace GLOB '*[0-9]:[0-9][0-9]'"
+    ))
+    db.session.commit()
+
+def migrate_strava_import_mark():
+    """Add strava_token.last_import_epoch; existing tokens start from a full re-scan"""
+    columns = {c['name'] for c in inspect(db.engine).get_columns('strava_token')}
+    if 'last_import_epoch' not in columns:
+        db.session.execute(db.text("ALTER TABLE strava_token ADD COLUMN last_import_epoch INTEGER"))
+        db.session.commit()
 
-with app.app_context():
-    db.create_all()
+@app.cli.command("init-db")
+def init_db_command():
+    """Create the database tables: flask --app app init-db"""
+    init_db()
+    print("✓ Database tables and indexes created")
 
 # Email verification token generator
+# Built once; tokens are unchanged since the key and salt are the same
+EMAIL_SERIALIZER = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='email-verification')
+
 def generate_verification_token(email):
-    serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
-    return serializer.dumps(email, salt='email-verification')
+    return EMAIL_SERIALIZER.dumps(email)
 
 def verify_token(token, expiration=3600):
-    serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
     try:
-        email = serializer.loads(token, salt='email-verification', max_age=expiration)
+        email = EMAIL_SERIALIZER.loads(token, max_age=expiration)
         return email
     except:
         return None
 
+def _deliver_email(msg):
+    """Background task: hand a built message to the pooled SMTP session"""
+    try:
+        SMTP_MAILER.send_message(msg)
+    except Exception as e:
+        print(f"Failed to send email to {msg['To']}: {e}")
+
 def send_verification_email(email, token):
-    """Send verification email to user"""
+    """Queue verification email to user; SMTP I/O happens off the request"""
     if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
         print("⚠️ Email credentials not configured. Verification email not sent.")
         return False
@@ -141,15 +354,24 @@ def send_verification_email(email, token):
     part = MIMEText(html, 'html')
     msg.attach(part)
     
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+    # The URL is built above because url_for needs the request context
+    EMAIL_EXECUTOR.submit(_deliver_email, msg)
+    return True
+
+@app.template_filter('display_date')
+def display_date(iso_date):
+    """Show a stored YYYY-MM-DD date as DD-MM-YYYY"""
+    if iso_date and len(iso_date) == 10:
+        return f"{iso_date[8:10]}-{iso_date[5:7]}-{iso_date[0:4]}"
+    return iso_date
+
+@app.template_filter('pace_fmt')
+def format_pace(pace_seconds):
+    """Format a seconds-per-km pace as MM:SS"""
+    if pace_seconds is None:
+        return None
+    pace_mins, pace_secs = divmod(pace_seconds, 60)
+    return f"{pace_mins:02d}:{pace_secs:02d}"
 
 # Login required decorator
 def login_required(f):
@@ -163,111 +385,240 @@ def login_required(f):
 
 # Helper functions (same as before)
 def get_month_year(date_str):
-    if date_str:
-        parts = date_str.split('-')
-        if len(parts) == 3:
-            return f"{parts[1]}-{parts[2]}"
+    if date_str and len(date_str) >= 7:
+        return date_str[:7]
     return None
 
+def split_iso_date(iso_str):
+    """Turn 'YYYY-MM-DD...' into ('YYYY-MM-DD', 'YYYY-MM') by slicing, or None
+    for a malformed or impossible date"""
+    # Separator check first: fromisoformat also takes the basic YYYYMMDD form
+    if not iso_str or len(iso_str) < 10 or iso_str[4] != '-' or iso_str[7] != '-':
+        return None
+    try:
+        dt.date.fromisoformat(iso_str[:10])
+    except ValueError:
+        return None
+    return iso_str[:10], iso_str[:7]
+
+def pace_seconds_per_km(total_seconds, distance_km):
+    """Whole seconds per km for a duration and distance, or None"""
+    if not distance_km or distance_km <= 0:
+        return None
+    return int(total_seconds / distance_km)
+
 def calculate_pace(distance_km, time_str):
     if not distance_km or distance_km <= 0 or not time_str:
         return None
+    colons = time_str.count(':')
     try:
-        time_parts = time_str.split(':')
-        if len(time_parts) == 3:
-            hours, minutes, seconds = map(int, time_parts)
-            total_minutes = hours * 60 + minutes + seconds / 60
-        elif len(time_parts) == 2:
-            minutes, seconds = map(int, time_parts)
-            total_minutes = minutes + seconds / 60
+        if colons == 2:
+            hours, minutes, seconds = time_str.split(':')
+            total_seconds = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+        elif colons == 1:
+            minutes, seconds = time_str.split(':')
+            total_seconds = int(minutes) * 60 + int(seconds)
         else:
             return None
-        pace_minutes = total_minutes / distance_km
-        pace_mins = int(pace_minutes)
-        pace_secs = int((pace_minutes - pace_mins) * 60)
-        return f"{pace_mins:02d}:{pace_secs:02d}"
-    except (ValueError, ZeroDivisionError):
+    except ValueError:
         return None
+    return pace_seconds_per_km(total_seconds, distance_km)
+
+def _cache_strava_token(user_id, **token_values):
+    """Cache the token's column values; needs access_token and expires_at"""
+    with _STRAVA_TOKEN_LOCK:
+        _STRAVA_TOKEN_CACHE[user_id] = dict(token_values, cached_at=time.time())
+
+def _cached_strava_token(user_id):
+    """Cached token entry if it is fresh and not close to expiry, else None"""
+    cached = _STRAVA_TOKEN_CACHE.get(user_id)
+    now = time.time()
+    if (cached and now - cached['cached_at'] < STRAVA_TOKEN_CACHE_TTL
+            and now < cached['expires_at'] - STRAVA_TOKEN_REFRESH_MARGIN):
+        return cached
+    return None
+
+def _invalidate_strava_token(user_id):
+    with _STRAVA_TOKEN_LOCK:
+        _STRAVA_TOKEN_CACHE.pop(user_id, None)
 
-def get_valid_strava_token():
+def current_strava_token():
+    """The logged-in user's StravaToken row, loaded at most once per request"""
+    if 'strava_token' not in g:
+        g.strava_token = db.session.scalar(db.select(StravaToken).filter_by(user_id=session['user_id']))
+    return g.strava_token
+
+def get_valid_strava_token(force_refresh=False):
     if 'user_id' not in session:
         return None
-    token_record = db.session.query(StravaToken).filter_by(user_id=session['user_id']).first()
+    user_id = session['user_id']
+    cached = None if force_refresh else _cached_strava_token(user_id)
+    if cached:
+        return cached['access_token']
+    token_record = current_strava_token()
     if not token_record:
         return None
-    current_time = dt.datetime.now().timestamp()
-    if current_time >= token_record.expires_at:
-        response = requests.post(
-            "https://www.strava.com/oauth/token",
-            data={
-                "client_id": STRAVA_CLIENT_ID,
-                "client_secret": STRAVA_CLIENT_SECRET,
-                "grant_type": "refresh_token",
-                "refresh_token": token_record.refresh_token
-            }
-        )
+    current_time = time.time()
+    if force_refresh or current_time >= token_record.expires_at - STRAVA_TOKEN_REFRESH_MARGIN:
+        try:
+            response = STRAVA_HTTP.post(
+                "https://www.strava.com/oauth/token",
+                data={
+                    "client_id": STRAVA_CLIENT_ID,
+                    "client_secret": STRAVA_CLIENT_SECRET,
+                    "grant_type": "refresh_token",
+                    "refresh_token": token_record.refresh_token
+                },
+                timeout=STRAVA_TIMEOUT
+            )
+        except requests.RequestException as e:
+            print(f"Strava token refresh failed: {e}")
+            response = None
+        if response is None or response.status_code == 429 or response.status_code >= 500:
+            # Transient failure: a proactive refresh can fail softly while the
+            # old token still works
+            if not force_refresh and current_time < token_record.expires_at:
+                return token_record.access_token
+            _invalidate_strava_token(user_id)
+            return None
         if response.status_code == 200:
             data = response.json()
             token_record.access_token = data["access_token"]
             token_record.refresh_token = data["refresh_token"]
             token_record.expires_at = data["expires_at"]
             db.session.commit()
-            return data["access_token"]
         else:
+            _invalidate_strava_token(user_id)
             return None
+    _cache_strava_token(
+        user_id,
+        access_token=token_record.access_token,
+        refresh_token=token_record.refresh_token,
+        expires_at=token_record.expires_at
+    )
     return token_record.access_token
 
-def fetch_strava_activities():
-    access_token = get_valid_strava_token()
-    if not access_token:
+def strava_import_after(token_record):
+    """Epoch for Strava's `after` filter. 0 before the first import, so Strava
+    returns oldest-first and the page cap only defers the rest to the next run"""
+    if token_record is None or token_record.last_import_epoch is None:
+        return 0
+    # Overlap catches manual / late-synced uploads; known IDs are skipped on insert
+    return max(token_record.last_import_epoch - STRAVA_IMPORT_OVERLAP, 0)
+
+def strava_start_epoch(activity):
+    """Epoch of an activity's UTC start_date, or None if it is missing or malformed"""
+    try:
+        return int(dt.datetime.fromisoformat(activity['start_date'].replace('Z', '+00:00')).timestamp())
+    except (KeyError, AttributeError, ValueError):
         return None
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(
-        "https://www.strava.com/api/v3/athlete/activities",
-        headers=headers,
-        params={"per_page": 30}
-    )
+
+def _request_activity_page(page, headers, after=None):
+    params = {"per_page": STRAVA_PAGE_SIZE, "page": page}
+    if after is not None:
+        params["after"] = after
+    with _STRAVA_PAGE_SLOTS:
+        return STRAVA_HTTP.get(
+            "https://www.strava.com/api/v3/athlete/activities",
+            headers=headers,
+            params=params,
+            timeout=STRAVA_TIMEOUT
+        )
+
+def _fetch_activity_page(page, headers, after=None):
+    response = _request_activity_page(page, headers, after)
     if response.status_code == 200:
         return response.json()
     else:
         return None
 
-def import_strava_activity(activity):
-    existing = db.session.query(Athlete_Data).filter_by(strava_id=activity['id']).first()
-    if existing:
-        return False
-    activity_date = dt.datetime.strptime(activity['start_date_local'], "%Y-%m-%dT%H:%M:%SZ")
-    date_str = activity_date.strftime("%d-%m-%Y")
-    month_year_str = activity_date.strftime("%m-%Y")
+def fetch_strava_activities(after=None):
+    """Activities from Strava (newer than `after` if given), or None on failure"""
+    try:
+        return _fetch_strava_activities(after)
+    except requests.RequestException as e:
+        # Timeouts and connection errors, including those re-raised from page workers
+        print(f"Strava activity fetch failed: {e}")
+        return None
+
+def _fetch_strava_activities(after):
+    access_token = get_valid_strava_token()
+    if not access_token:
+        return None
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = _request_activity_page(1, headers, after)
+    if response.status_code == 401:
+        # Token was revoked or expired early: refresh once and retry
+        _invalidate_strava_token(session['user_id'])
+        access_token = get_valid_strava_token(force_refresh=True)
+        if not access_token:
+            return None
+        headers = {"Authorization": f"Bearer {access_token}"}
+        response = _request_activity_page(1, headers, after)
+    if response.status_code != 200:
+        return None
+    activities = response.json()
+    if len(activities) < STRAVA_PAGE_SIZE:
+        return activities
+    
+    # First page was full: pull the rest in concurrent batches, in page order
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=STRAVA_FETCH_WORKERS) as pool:
+        while next_page <= STRAVA_MAX_PAGES:
+            batch = range(next_page, min(next_page + STRAVA_FETCH_WORKERS, STRAVA_MAX_PAGES + 1))
+            for page_activities in pool.map(lambda p: _fetch_activity_page(p, headers, after), batch):
+                if page_activities is None:
+                    # A missing page would be skipped for good once the import's
+                    # `after` high-water mark moves past it, so fail the whole fetch
+                    return None
+                activities.extend(page_activities)
+                if len(page_activities) < STRAVA_PAGE_SIZE:
+                    return activities
+            next_page = batch.stop
+    return activities
+
+def _build_athlete_row(activity):
+    """Athlete_Data column values for a Strava activity payload"""
+    # start_date_local is ISO 8601 ("YYYY-MM-DDTHH:MM:SSZ"), stored as its date part
+    date_str, month_year_str = split_iso_date(activity['start_date_local'])
     distance = activity['distance'] / 1000
     moving_time = activity['moving_time']
-    hours = moving_time // 3600
-    minutes = (moving_time % 3600) // 60
-    seconds = moving_time % 60
+    hours, remainder = divmod(moving_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
     time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-    pace = calculate_pace(distance, time_str)
-    activity_type_map = {
-        'Run': 'Running',
-        'Ride': 'Cycling',
-        'Swim': 'Swimming',
-        'Walk': 'Walking',
-        'WeightTraining': 'Gym'
-    }
-    activity_type = activity_type_map.get(activity['type'], activity['type'])
-    new_record = Athlete_Data(
+    pace_seconds = pace_seconds_per_km(moving_time, distance)
+    activity_type = STRAVA_ACTIVITY_TYPES.get(activity['type'], activity['type'])
+    return dict(
         user_id=session['user_id'],
         date=date_str,
         activity_type=activity_type,
         distance=round(distance, 2),
         time=time_str,
-        pace=pace,
+        pace=format_pace(pace_seconds),
+        pace_seconds=pace_seconds,
         calories=activity.get('calories'),
         month_year=month_year_str,
         strava_id=activity['id']
     )
-    db.session.add(new_record)
-    db.session.commit()
-    return True
+
+def complete_oauth_login(email, name, provider, oauth_id):
+    """Log in the OAuth user, creating the account on first sign-in only"""
+    user = db.session.scalar(db.select(User).filter_by(email=email))
+    if not user:
+        user = User(
+            email=email,
+            username=name,
+            oauth_provider=provider,
+            oauth_id=oauth_id,
+            email_verified=True  # OAuth emails are pre-verified
+        )
+        db.session.add(user)
+        db.session.commit()
+    
+    session['user_id'] = user.id
+    session['username'] = user.username or user.email
+    flash('Login successful!', 'success')
+    return redirect(url_for('home'))
 
 # Authentication Routes
 @app.route('/login', methods=['GET', 'POST'])
@@ -279,7 +630,7 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        user = db.session.query(User).filter_by(email=email).first()
+        user = db.session.scalar(db.select(User).filter_by(email=email))
         
         if user and user.password_hash and check_password_hash(user.password_hash, password):
             if not user.email_verified:
@@ -309,19 +660,20 @@ def register():
             flash('Passwords do not match', 'error')
             return redirect(url_for('register'))
         
-        existing_user = db.session.query(User).filter_by(email=email).first()
-        if existing_user:
-            flash('Email already registered', 'error')
-            return redirect(url_for('register'))
-        
         new_user = User(
             email=email,
             username=username,
-            password_hash=generate_password_hash(password),
+            password_hash=generate_password_hash(password, method=PASSWORD_HASH_METHOD),
             email_verified=False
         )
         db.session.add(new_user)
-        db.session.commit()
+        # The unique constraint on email does the duplicate check, no SELECT needed
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Email already registered', 'error')
+            return redirect(url_for('register'))
         
         # Send verification email
         token = generate_verification_token(email)
@@ -341,7 +693,7 @@ def verify_email(token):
         flash('Invalid or expired verification link', 'error')
         return redirect(url_for('login'))
     
-    user = db.session.query(User).filter_by(email=email).first()
+    user = db.session.scalar(db.select(User).filter_by(email=email))
     if user:
         user.email_verified = True
         db.session.commit()
@@ -353,7 +705,7 @@ def verify_email(token):
 
 @app.route('/login/google')
 def google_login():
-    redirect_uri = url_for('google_callback', _external=True).replace("http://", "https://")
+    redirect_uri = url_for('google_callback', _external=True, _scheme="https")
     # redirect_uri = "https://web-production-289c2.up.railway.app/callback/google"
     return google.authorize_redirect(redirect_uri)
 
@@ -366,26 +718,11 @@ def google_callback():
     name = user_info.get('name')
     oauth_id = user_info.get('sub')
     
-    user = db.session.query(User).filter_by(email=email).first()
-    if not user:
-        user = User(
-            email=email,
-            username=name,
-            oauth_provider='google',
-            oauth_id=oauth_id,
-            email_verified=True  # OAuth emails are pre-verified
-        )
-        db.session.add(user)
-        db.session.commit()
-    
-    session['user_id'] = user.id
-    session['username'] = user.username or user.email
-    flash('Login successful!', 'success')
-    return redirect(url_for('home'))
+    return complete_oauth_login(email, name, 'google', oauth_id)
 
 @app.route('/login/github')
 def github_login():
-    redirect_uri = url_for('github_callback', _external=True).replace("http://", "https://")
+    redirect_uri = url_for('github_callback', _external=True, _scheme="https")
     return github.authorize_redirect(redirect_uri)
 
 @app.route('/callback/github')
@@ -407,22 +744,7 @@ def github_callback():
     name = user_info.get('name') or user_info.get('login')
     oauth_id = str(user_info.get('id'))
     
-    user = db.session.query(User).filter_by(email=email).first()
-    if not user:
-        user = User(
-            email=email,
-            username=name,
-            oauth_provider='github',
-            oauth_id=oauth_id,
-            email_verified=True
-        )
-        db.session.add(user)
-        db.session.commit()
-    
-    session['user_id'] = user.id
-    session['username'] = user.username or user.email
-    flash('Login successful!', 'success')
-    return redirect(url_for('home'))
+    return complete_oauth_login(email, name, 'github', oauth_id)
 
 @app.route('/logout')
 def logout():
@@ -434,29 +756,53 @@ def logout():
 @app.route('/')
 @login_required
 def home():
-    strava_connected = db.session.query(StravaToken).filter_by(user_id=session['user_id']).first() is not None
+    page = max(request.args.get('page', 1, type=int), 1)
     
-    result = db.session.execute(
-        db.select(Athlete_Data)
-        .filter_by(user_id=session['user_id'])
-        .order_by(Athlete_Data.date.desc(), Athlete_Data.id.desc())
-    )
-    athlete_data = list(result.scalars())
+    # Plain column rows (no ORM instances) for the table; fetch one extra row
+    # to know whether an older page exists
+    athlete_data = db.session.execute(
+        db.select(
+            Athlete_Data.id, Athlete_Data.date, Athlete_Data.activity_type, Athlete_Data.distance,
+            Athlete_Data.time, Athlete_Data.pace_seconds, Athlete_Data.calories, Athlete_Data.month_year
+        )
+        .where(Athlete_Data.user_id == session['user_id'])
+        .order_by(Athlete_Data.month_year.desc(), Athlete_Data.date.desc(), Athlete_Data.id.desc())
+        .limit(HOME_PAGE_SIZE + 1)
+        .offset((page - 1) * HOME_PAGE_SIZE)
+    ).all()
+    has_next = len(athlete_data) > HOME_PAGE_SIZE
+    athlete_data = athlete_data[:HOME_PAGE_SIZE]
     
-    monthly_data = defaultdict(list)
-    for record in athlete_data:
-        if record.month_year:
-            monthly_data[record.month_year].append(record)
+    # Rows arrive ordered by month, so each month is one contiguous run
+    monthly_data = {
+        month: list(records)
+        for month, records in groupby(athlete_data, key=attrgetter('month_year'))
+        if month
+    }
     
+    # Per-month and overall sums are computed by SQLite rather than in Python
+    distance_sum = func.sum(func.coalesce(Athlete_Data.distance, 0.0))
+    calories_sum = func.sum(func.coalesce(Athlete_Data.calories, 0.0))
+    totals = db.session.execute(
+        db.select(Athlete_Data.month_year, distance_sum, calories_sum, func.count())
+        .filter_by(user_id=session['user_id'])
+        .group_by(Athlete_Data.month_year)
+    ).all()
     monthly_totals = {}
-    for month, records in monthly_data.items():
-        total_distance = sum((r.distance or 0.0) for r in records)
-        total_calories = sum((r.calories or 0.0) for r in records)
-        monthly_totals[month] = {'distance': total_distance, 'calories': total_calories}
+    for month, distance, calories, count in totals:
+        if month:
+            monthly_totals[month] = {'distance': distance, 'calories': calories, 'count': count}
     
-    sorted_months = sorted(monthly_data.keys(), key=lambda x: dt.datetime.strptime(x, "%m-%Y"), reverse=True)
-    total_distance = sum((m.distance or 0.0) for m in athlete_data)
-    total_calories = sum((m.calories or 0.0) for m in athlete_data)
+    sorted_months = list(monthly_data)
+    # The Strava-connected flag rides along on the single-row totals query
+    total_distance, total_calories, strava_connected = db.session.execute(
+        db.select(
+            func.coalesce(distance_sum, 0.0),
+            func.coalesce(calories_sum, 0.0),
+            exists().where(StravaToken.user_id == session['user_id'])
+        )
+        .where(Athlete_Data.user_id == session['user_id'])
+    ).one()
     
     return render_template("index.html", 
                          monthly_data=monthly_data, 
@@ -465,6 +811,8 @@ def home():
                          total_distance=total_distance,
                          total_calories=total_calories,
                          strava_connected=strava_connected,
+                         page=page,
+                         has_next=has_next,
                          username=session.get('username'))
 
 @app.route('/strava/connect')
@@ -489,48 +837,73 @@ def strava_callback():
     if not code:
         flash("Authorization failed", "error")
         return redirect(url_for('home'))
-    response = requests.post(
-        "https://www.strava.com/oauth/token",
-        data={
-            "client_id": STRAVA_CLIENT_ID,
-            "client_secret": STRAVA_CLIENT_SECRET,
-            "code": code,
-            "grant_type": "authorization_code"
-        }
-    )
-    if response.status_code == 200:
+    try:
+        response = STRAVA_HTTP.post(
+            "https://www.strava.com/oauth/token",
+            data={
+                "client_id": STRAVA_CLIENT_ID,
+                "client_secret": STRAVA_CLIENT_SECRET,
+                "code": code,
+                "grant_type": "authorization_code"
+            },
+            timeout=STRAVA_TIMEOUT
+        )
+    except requests.RequestException as e:
+        print(f"Strava token exchange failed: {e}")
+        response = None
+    if response is not None and response.status_code == 200:
         data = response.json()
-        token_record = db.session.query(StravaToken).filter_by(user_id=session['user_id']).first()
-        if token_record:
-            token_record.access_token = data["access_token"]
-            token_record.refresh_token = data["refresh_token"]
-            token_record.expires_at = data["expires_at"]
-            token_record.athlete_id = data["athlete"]["id"]
-        else:
-            token_record = StravaToken(
-                user_id=session['user_id'],
-                access_token=data["access_token"],
-                refresh_token=data["refresh_token"],
-                expires_at=data["expires_at"],
-                athlete_id=data["athlete"]["id"]
-            )
-            db.session.add(token_record)
+        token_values = dict(
+            access_token=data["access_token"],
+            refresh_token=data["refresh_token"],
+            expires_at=data["expires_at"],
+            athlete_id=data["athlete"]["id"]
+        )
+        # Insert or replace the user's token in one statement (unique user_id).
+        # Connecting a different athlete restarts imports from a full scan.
+        token_table = StravaToken.__table__
+        upsert = sqlite_insert(token_table).values(user_id=session['user_id'], **token_values)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_=dict(token_values, last_import_epoch=case(
+                (token_table.c.athlete_id == upsert.excluded.athlete_id, token_table.c.last_import_epoch),
+                else_=None
+            ))
+        ))
         db.session.commit()
+        g.pop('strava_token', None)
+        _cache_strava_token(session['user_id'], **token_values)
         flash("Strava connected successfully!", "success")
     else:
         flash("Failed to connect to Strava", "error")
     return redirect(url_for('home'))
 
 @app.route('/strava/import')
+@login_required
 def strava_import():
-    activities = fetch_strava_activities()
-    if not activities:
+    # Only ask Strava for activities newer than what we already have
+    token_record = current_strava_token()
+    activities = fetch_strava_activities(after=strava_import_after(token_record))
+    if activities is None:
         flash("Failed to fetch Strava activities. Please reconnect.", "error")
         return redirect(url_for('home'))
-    imported_count = 0
-    for activity in activities:
-        if import_strava_activity(activity):
-            imported_count += 1
+    if not activities:
+        flash("No new activities to import", "info")
+        return redirect(url_for('home'))
+    # One executemany INSERT ... ON CONFLICT DO NOTHING: the unique strava_id
+    # index skips activities already stored, so no existence check is needed.
+    # Core (table-level) insert keeps the driver's summed rowcount.
+    result = db.session.execute(
+        sqlite_insert(Athlete_Data.__table__).on_conflict_do_nothing(index_elements=['strava_id']),
+        [_build_athlete_row(a) for a in activities]
+    )
+    # Advance the mark from Strava's own start times (not the editable date
+    # column), in the same commit as the rows it covers
+    newest = max(filter(None, map(strava_start_epoch, activities)), default=None)
+    if newest is not None and newest > (token_record.last_import_epoch or 0):
+        token_record.last_import_epoch = newest
+    db.session.commit()
+    imported_count = result.rowcount
     if imported_count > 0:
         flash(f"Successfully imported {imported_count} activities from Strava!", "success")
     else:
@@ -539,10 +912,12 @@ def strava_import():
 
 @app.route('/strava/disconnect')
 def strava_disconnect():
-    token_record = db.session.query(StravaToken).filter_by(user_id=session['user_id']).first()
+    token_record = current_strava_token()
+    _invalidate_strava_token(session['user_id'])
     if token_record:
         db.session.delete(token_record)
         db.session.commit()
+        g.strava_token = None
         flash("Strava disconnected successfully", "success")
     return redirect(url_for('home'))
 
@@ -550,25 +925,23 @@ def strava_disconnect():
 def edit():
     if request.method == "POST":
         athlete_id = int(request.form.get("id"))
-        athlete_record = db.get_or_404(Athlete_Data, athlete_id)
+        athlete_record = db.session.get(Athlete_Data, athlete_id)
+        if athlete_record is None:
+            abort(404)
         if athlete_record.user_id != session['user_id']:
             flash("Unauthorized access", "error")
             return redirect(url_for('home'))
-        new_date_raw = request.form.get("date")
-        if new_date_raw:
-            try:
-                parsed = dt.datetime.strptime(new_date_raw, "%Y-%m-%d")
-                athlete_record.date = parsed.strftime("%d-%m-%Y")
-                athlete_record.month_year = parsed.strftime("%m-%Y")
-            except (ValueError, TypeError):
-                pass
+        new_date = split_iso_date(request.form.get("date"))
+        if new_date:
+            athlete_record.date, athlete_record.month_year = new_date
         athlete_record.activity_type = request.form.get("activity_type", "Running")
         try:
             athlete_record.distance = float(request.form.get("distance", 0))
         except (ValueError, TypeError):
             athlete_record.distance = 0
         athlete_record.time = request.form.get("time", "00:00:00")
-        athlete_record.pace = calculate_pace(athlete_record.distance, athlete_record.time)
+        athlete_record.pace_seconds = calculate_pace(athlete_record.distance, athlete_record.time)
+        athlete_record.pace = format_pace(athlete_record.pace_seconds)
         try:
             athlete_record.calories = float(request.form.get("calories", 0))
         except (ValueError, TypeError):
@@ -605,32 +978,23 @@ def add():
         except (ValueError, TypeError):
             distance = 0
         time_str = request.form.get("time", "00:00:00")
-        pace = calculate_pace(distance, time_str)
+        pace_seconds = calculate_pace(distance, time_str)
         try:
             calories = float(request.form.get("calories", 0))
         except (ValueError, TypeError):
             calories = 0
-        date_raw = request.form.get("date")
-        if date_raw:
-            try:
-                parsed = dt.datetime.strptime(date_raw, "%Y-%m-%d")
-                date_str = parsed.strftime("%d-%m-%Y")
-                month_year_str = parsed.strftime("%m-%Y")
-            except (ValueError, TypeError):
-                now = dt.datetime.now()
-                date_str = now.strftime("%d-%m-%Y")
-                month_year_str = now.strftime("%m-%Y")
-        else:
-            now = dt.datetime.now()
-            date_str = now.strftime("%d-%m-%Y")
-            month_year_str = now.strftime("%m-%Y")
+        parsed = split_iso_date(request.form.get("date"))
+        if not parsed:
+            parsed = split_iso_date(dt.date.today().isoformat())
+        date_str, month_year_str = parsed
         new_record = Athlete_Data(
             user_id=session['user_id'],
             date=date_str,
             activity_type=activity_type,
             distance=distance,
             time=time_str,
-            pace=pace,
+            pace=format_pace(pace_seconds),
+            pace_seconds=pace_seconds,
             calories=calories,
             month_year=month_year_str
         )
@@ -642,5 +1006,6 @@ def add():
         return render_template("add.html")
 
 if __name__ == "__main__":
+    init_db()
     port = int(os.environ.get("PORT", 5001))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
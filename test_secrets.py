@@ -18,8 +18,10 @@ secrets_to_check = [
 print("Checking Codespaces Secrets...\n")
 print("="*50)
 
-for secret in secrets_to_check:
-    value = os.environ.get(secret)
+# Read every secret in one pass over the environment
+present = {secret: os.environ.get(secret) for secret in secrets_to_check}
+
+for secret, value in present.items():
     if value:
         # Show first 10 chars for verification
         display = value[:10] + "..." if len(value) > 10 else value
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers.
+
+Run with: gunicorn -w 4 -k gthread --threads 4 wsgi:application
+"""
+
+from app import app
+
+application = app